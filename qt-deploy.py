@@ -7,13 +7,78 @@ Part of the Qt-Deployment scripts
 import os
 import sys
 import stat
+import time
+import json
+import hashlib
 import shutil
 import zipfile
 import tarfile
+import signal
+import tempfile
+import threading
 import ConfigParser
 import argparse
 import subprocess
-from subprocess import check_call
+from subprocess import check_call, CalledProcessError
+try:
+    import pyinotify
+except ImportError:    # fall back to polling in watch mode
+    pyinotify = None
+
+PLAN_FORMAT = 4  # increase when the layout of the plan changes
+
+# launcher of the self-extracting bundle, the numbers are padded so the
+# length of the stub does not depend on them
+BUNDLE_STUB = '''#!/usr/bin/env bash
+# self-extracting bundle created by qt-deploy
+NAME="%(name)s"
+HASH="%(hash)s"
+TARGET="%(target)s"
+STRIP=%(strip)-4i
+OFFSET=%(offset)-12i
+STARTUP_SIZE=%(startupSize)-12i
+REST_SIZE=%(restSize)-12i
+SELF="$(readlink -f "$0")"
+CACHE="${XDG_CACHE_HOME:-$HOME/.cache}/$NAME"
+DIR="$CACHE/$HASH"
+
+extract() {
+    tail -c +$(($1 + 1)) "$SELF" | head -c $2 | tar -xz --strip-components=$STRIP -C "$3"
+}
+
+if [ ! -e "$DIR/.startup" ]; then
+    mkdir -p "$CACHE" || exit 1
+    TMP="$(mktemp -d "$CACHE/.$HASH.XXXXXX")" || exit 1
+    if ! extract $OFFSET $STARTUP_SIZE "$TMP"; then
+        rm -rf "$TMP"
+        exit 1
+    fi
+    touch "$TMP/.startup"
+    if [ $REST_SIZE -eq 0 ]; then
+        touch "$TMP/.complete"
+    fi
+    # another instance may have been faster
+    mv -T "$TMP" "$DIR" 2>/dev/null || rm -rf "$TMP"
+    # remove stale versions
+    for d in "$CACHE"/*; do
+        if [ "$d" != "$DIR" ]; then
+            rm -rf "$d"
+        fi
+    done
+fi
+
+if [ ! -e "$DIR/.complete" ]; then
+    # members not needed at startup are extracted in the background
+    (
+        flock -n 9 || exit 0
+        if [ ! -e "$DIR/.complete" ]; then
+            extract $(($OFFSET + $STARTUP_SIZE)) $REST_SIZE "$DIR" && touch "$DIR/.complete"
+        fi
+    ) 9>"$DIR/.lock" </dev/null >/dev/null 2>&1 &
+fi
+
+exec "$DIR/$TARGET" "$@"
+'''
 
 
 def copy(src, dst):
@@ -42,6 +107,111 @@ def copyLib(src, dstDir, version=''):
                     os.path.join(dstDir, srcNameExtended))
 
 
+class HashingWriter:
+    # file object hashing all data on the way to the archive file
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.name = fileobj.name
+        self.hash = hashlib.sha256()
+        self.position = 0
+
+    def write(self, data):
+        self.hash.update(data)
+        self.position += len(data)
+        self.fileobj.write(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def close(self):
+        self.fileobj.close()
+
+
+class HashingReader:
+    # file object hashing all data read from an archive member
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hash = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.hash.update(data)
+        return data
+
+
+def fileChecksum(path):
+    with open(path, 'rb') as f:
+        reader = HashingReader(f)
+        while reader.read(65536):
+            pass
+    return reader.hash.hexdigest()
+
+
+def updateChecksums(path, name, digest=None):
+    # SHA256SUMS is shared between packages, replace only the line of this one
+    # or remove it if no digest is given
+    lines = []
+    if os.path.isfile(path):
+        with open(path, 'r') as f:
+            lines = [l for l in f.readlines() if l.rstrip('\n').split('  ', 1)[-1] != name]
+    elif digest is None:
+        return
+    if digest is not None:
+        lines.append('%s  %s\n' % (digest, name))
+    with open(path, 'w') as f:
+        f.writelines(lines)
+
+
+def killProcessGroup(proc, sig):
+    try:
+        os.killpg(proc.pid, sig)
+    except OSError:    # all processes already exited
+        pass
+    return True
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return 0
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def parseLinkerDebug(debugPrefix, rootDir):
+    # LD_DEBUG_OUTPUT writes one file per process, only the ones
+    # touching the unpacked package belong to the application
+    stats = {'startupCycles': 0, 'relocations': 0, 'libraries': 0, 'plugins': 0}
+    debugDir = os.path.dirname(debugPrefix)
+    for f in os.listdir(debugDir):
+        if not f.startswith(os.path.basename(debugPrefix) + '.'):
+            continue
+        with open(os.path.join(debugDir, f)) as debugFile:
+            content = debugFile.read()
+        if rootDir not in content:
+            continue
+        plugins = set()
+        for line in content.splitlines():
+            line = line.split(':', 1)[-1].strip()
+            if line.startswith('file=') and line.endswith('generating link map'):
+                stats['libraries'] += 1
+            elif line.startswith('file=') and 'dynamically loaded by' in line:
+                plugins.add(line.split()[0])
+            elif line.startswith('total startup time in dynamic loader:'):
+                stats['startupCycles'] += int(line.split(':')[1].split()[0])
+            elif line.startswith('number of relocations:'):
+                stats['relocations'] += int(line.split(':')[1])
+        stats['plugins'] += len(plugins)
+    return stats
+
+
 class QtDeployment:
 
     def cleanup(self):
@@ -54,6 +224,15 @@ class QtDeployment:
         if os.path.isfile(self.zipName):
             os.remove(self.zipName)
 
+        if os.path.isfile(self.manifestFile):
+            os.remove(self.manifestFile)
+
+        if os.path.isfile(self.bundleFile):
+            os.remove(self.bundleFile)
+
+        for path in [self.zipName, self.bundleFile]:
+            updateChecksums(self.checksumFile, os.path.basename(path))
+
         if os.path.exists(self.targetOriginal):
             shutil.rmtree(self.targetOriginal)
 
@@ -158,16 +337,27 @@ class QtDeployment:
 
             sys.stdout.write("done\n")
 
+        # everything not copied by us was resolved by windeployqt
+        sizes = {}
+        files = self.deployedFiles()
+        for f in files:
+            component = 'windeployqt'
+            if f == targetFile:
+                component = 'target'
+            elif self.libs[0] != '':
+                for lib in self.libs:
+                    if f == os.path.join(self.outLibDir, self.libraryPrefix + lib + self.libraryExtension):
+                        component = 'lib:' + lib
+            size = os.path.getsize(f)
+            sizes[f] = (component, size, size)
+
         sys.stdout.write("compressing files...")
         sys.stdout.flush()
-        # create zip file
-        with zipfile.ZipFile(self.zipName, 'w', zipfile.ZIP_DEFLATED) as myzip:
-            for root, dirs, files in os.walk(self.deploymentDir):
-                for f in files:
-                    myzip.write(os.path.join(root, f))
-            myzip.close()
+        compressed = self.createArchive(files)
         sys.stdout.write("done\n")
 
+        self.sizeReport(sizes, compressed)
+
     def deployAndroid(self):
         self.cleanup()
 
@@ -210,15 +400,59 @@ class QtDeployment:
         sys.stdout.write("done\n")
 
     def deployLinux(self):
-        self.cleanup()
-
-        sys.stdout.write("copying files...")
-        sys.stdout.flush()
+        try:
+            self.applyPlan(self.createPlan())
+        except IOError as e:
+            sys.stderr.write('%s\n' % e)
+            exit(1)
 
-        # create lib dir
-        os.makedirs(self.outLibDir)
+    def resolveLib(self, libName, libDirs, version):
+        # returns the directory containing the library and the matching files
+        for libDir in libDirs:
+            if not os.path.exists(libDir):
+                continue
+            if version == '':
+                files = [f for f in os.listdir(libDir) if libName in f]
+            else:
+                files = [f for f in [libName + '.' + version] if os.path.isfile(os.path.join(libDir, f))]
+            if files:
+                return libDir, files
+        # not fatal in watch mode, the library may be rebuilt right now
+        raise IOError('could not find library %s' % libName)
+
+    def planLib(self, libName, libDirs, version, component):
+        libDir, files = self.resolveLib(libName, libDirs, version)
+        # use library in the style *.so.<major_version> instead of the symlinks
+        for f in files:
+            index = f.find('.so')
+            if f[index:].count('.') == 2:
+                files = [f]
+                break
 
-        # copy Qt libs
+        entries = []
+        for f in sorted(files, key=len):
+            inPath = os.path.join(libDir, f)
+            outPath = os.path.join(self.outLibDir, f)
+            if (len(files) > 1) and os.path.islink(inPath):
+                entries.append(self.planEntry('link', os.readlink(inPath), outPath, component))
+            else:
+                entries.append(self.planEntry('strip', inPath, outPath, component, executable=False))
+        return entries
+
+    def planEntry(self, action, src, dst, component=None, executable=None):
+        size = 0
+        if action in ('copy', 'strip', 'skip'):
+            size = os.path.getsize(src)
+        return {'action': action, 'src': src, 'dst': dst, 'size': size,
+                'component': component, 'executable': executable}
+
+    def planLinux(self):
+        # inventory of every file of the deployment, nothing is touched here
+        entries = []
+        for path in [self.deploymentDir, self.zipName, self.bundleFile, self.targetOriginal]:
+            entries.append(self.planEntry('delete', None, path))
+
+        # Qt libs
         if self.qtLibs[0] != '':
             for lib in self.qtLibs:
                 # if version os specified copy only libs with this version
@@ -227,12 +461,10 @@ class QtDeployment:
                 lib = libSplit[0]
                 if len(libSplit) > 1:
                     version = libSplit[1]
-
                 libName = self.libraryPrefix + lib + self.libraryExtension
-                inPath = os.path.join(self.qtLibDir, libName)
-                copyLib(inPath, self.outLibDir, version)
+                entries += self.planLib(libName, [self.qtLibDir], version, 'qtLib:' + lib)
 
-        # copy additional libraries
+        # additional libraries
         if self.libs[0] != '':
             for lib in self.libs:
                 # if version is specified copy only libs with this version
@@ -241,155 +473,675 @@ class QtDeployment:
                 lib = libSplit[0]
                 if len(libSplit) > 1:
                     version = libSplit[1]
-
                 libName = lib + self.libraryExtension
-                copied = False
-                for libDir in self.libDirs:
-                    if not os.path.exists(libDir):
-                        continue
-                    inPath = os.path.join(libDir, libName)
-                    found = False
-                    if version == '':
-                        for f in reversed(os.listdir(libDir)):
-                            if libName in f:
-                                found = True
-                                break
+                entries += self.planLib(libName, self.libDirs, version, 'lib:' + lib)
+
+        # Qt platform plugins
+        for plugin in self.platformPlugins:
+            pluginName = self.libraryPrefix + plugin + self.libraryExtension
+            entries.append(self.planEntry('copy', os.path.join(self.platformsDir, pluginName),
+                                          os.path.join(self.outPlatformsDir, pluginName),
+                                          'platformPlugin:' + plugin))
+
+        # target
+        entries.append(self.planEntry('strip', os.path.join(self.applicationDir, self.target),
+                                      os.path.join(self.outBinDir, self.target), 'target', executable=True))
+
+        # QML and Qt plugins
+        for srcDir, outDir in self.linuxTrees():
+            if outDir.startswith(self.outQmlDir):
+                component = 'qmlModule:' + os.path.relpath(outDir, self.outQmlDir)
+            else:
+                component = 'qtPlugin:' + os.path.relpath(outDir, self.outPluginDir)
+            for root, dirs, files in os.walk(srcDir):
+                for f in sorted(files):
+                    inPath = os.path.join(root, f)
+                    outPath = os.path.join(outDir, os.path.relpath(inPath, srcDir))
+                    if (f == 'plugins.qmltypes') and component.startswith('qmlModule:'):
+                        entries.append(self.planEntry('skip', inPath, outPath, component))
                     else:
-                        if os.path.isfile(inPath):
-                            found = True
-                    if found:
-                        copyLib(inPath, self.outLibDir, version)
-                        copied = True
-                        break
+                        entries.append(self.planEntry('copy', inPath, outPath, component))
+
+        # run.sh
+        entry = self.planEntry('write', None, os.path.join(self.deploymentDir, self.target), 'runScript',
+                               executable=True)
+        entry['size'] = len(self.runScript())
+        entries.append(entry)
+
+        return entries
+
+    def planKey(self):
+        # the plan stays valid as long as the config and the input dirs do not change
+        key = hashlib.sha1()
+        key.update(str(PLAN_FORMAT))
+        with open(self.configFile, 'rb') as f:
+            key.update(f.read())
+        key.update(str(self.version))
+        paths = [os.path.join(self.applicationDir, self.target), self.qtLibDir, self.platformsDir]
+        paths += self.libDirs
+        # files added or removed anywhere in the QML and plugin dirs change the mtime of their dir
+        for srcDir, outDir in self.linuxTrees():
+            for root, dirs, files in os.walk(srcDir):
+                paths.append(root)
+        for path in paths:
+            if os.path.exists(path):
+                key.update('%s %f\n' % (path, os.path.getmtime(path)))
+        return key.hexdigest()
+
+    def createPlan(self, useCache=True):
+        key = self.planKey()
+        if useCache and os.path.isfile(self.planFile):
+            with open(self.planFile, 'r') as f:
+                plan = json.load(f)
+            if plan['key'] == key:
+                if self.debug:
+                    print('using cached plan %s' % self.planFile)
+                return plan['entries']
+
+        sys.stdout.write("creating plan...")
+        sys.stdout.flush()
+        entries = self.planLinux()
+        if not self.dryRun:
+            with open(self.planFile, 'w') as f:
+                json.dump({'key': key, 'entries': entries}, f, indent=4, sort_keys=True)
+        sys.stdout.write("done\n")
+        return entries
 
-                if not copied:
-                    sys.stderr.write('could not find library %s\n' % libName)
-                    exit(1)
+    def printPlan(self, entries):
+        if self.debug:
+            for entry in entries:
+                print('%-6s %10i %s' % (entry['action'], entry['size'], entry['dst']))
+
+        counts = {}
+        sizes = {}
+        for entry in entries:
+            action = entry['action']
+            counts[action] = counts.get(action, 0) + 1
+            sizes[action] = sizes.get(action, 0) + entry['size']
+        for action in sorted(counts.keys()):
+            sys.stdout.write('%-6s %6i files %12i bytes\n' % (action, counts[action], sizes[action]))
+        written = [e for e in entries if e['action'] in ('copy', 'strip', 'link', 'write')]
+        sys.stdout.write('total  %6i files %12i bytes\n' % (len(written), sum([e['size'] for e in written])))
+
+    def applyPlan(self, entries):
+        # check the sources before anything is deleted
+        for entry in entries:
+            if (entry['action'] in ('copy', 'strip')) and not os.path.exists(entry['src']):
+                if self.debug:
+                    print('%s does not exist, the plan is outdated' % entry['src'])
+                entries = self.createPlan(useCache=False)
+                break
 
-        # cleanup symlinks, use library in the style *.so.<major_version>
-        libs = os.listdir(self.outLibDir)
-        libs.sort(key=len)
-        doneList = []
-        for lib in libs:
-            if lib in doneList:  # skip already processed files
+        sys.stdout.write("starting cleanup...")
+        sys.stdout.flush()
+        for entry in entries:
+            if entry['action'] != 'delete':
                 continue
-            list = [f for f in libs if lib in f]  # list all occurrences
-            target = None
-            match = None
-            for l in list:
-                index = l.find('.so')
-                count = l[index:].count('.')
-                if count == 2:
-                    match = l
-                if not os.path.islink(l):
-                    target = l
-            if target and match:
-                if target == match:
-                    continue
-                target = os.path.join(self.outLibDir, target)
-                match = os.path.join(self.outLibDir, match)
-                tmp = match + '.tmp'
-                shutil.copy(target, tmp)
-                for l in list:
-                    doneList.append(l)
-                    os.remove(os.path.join(self.outLibDir, l))
-                shutil.copy(tmp, match)
-                os.remove(tmp)
-
-        # remove executable bit from libraries
-        for f in os.listdir(self.outLibDir):
-            outFile = os.path.join(self.outLibDir, f)
-            st = os.stat(outFile)
-            os.chmod(outFile, st.st_mode & ~stat.S_IEXEC)
-
-        # create the platforms dir
-        os.makedirs(self.outPlatformsDir)
-
-        # copy Qt platform plugins
-        for plugin in self.platformPlugins:
-            pluginName = self.libraryPrefix + plugin + self.libraryExtension
-            inPath = os.path.join(self.platformsDir, pluginName)
-            outPath = os.path.join(self.outPlatformsDir, pluginName)
-            shutil.copyfile(inPath, outPath)
+            if os.path.isdir(entry['dst']):
+                shutil.rmtree(entry['dst'])
+            elif os.path.exists(entry['dst']):
+                os.remove(entry['dst'])
+            updateChecksums(self.checksumFile, os.path.basename(entry['dst']))
+        sys.stdout.write("done\n")
 
-        # create the bin dir
-        os.makedirs(self.outBinDir)
+        sys.stdout.write("copying files...")
+        sys.stdout.flush()
+        files = []
+        sizes = {}
+        for entry in entries:
+            action = entry['action']
+            if action in ('delete', 'skip'):
+                continue
+            outFile = entry['dst']
+            outDir = os.path.dirname(outFile)
+            if not os.path.exists(outDir):
+                os.makedirs(outDir)
+
+            if action == 'link':
+                os.symlink(entry['src'], outFile)
+                rawSize = 0
+                strippedSize = 0
+            elif action == 'write':
+                with open(outFile, 'w') as f:
+                    f.write(self.runScript())
+                rawSize = os.path.getsize(outFile)
+                strippedSize = rawSize
+            else:
+                shutil.copy(entry['src'], outFile)
+                rawSize = os.path.getsize(outFile)
+                # strip debug information
+                if action == 'strip':
+                    check_call(['strip', outFile])
+                strippedSize = os.path.getsize(outFile)
+            sizes[outFile] = (entry['component'], rawSize, strippedSize)
+            if entry['executable'] is not None:
+                st = os.stat(outFile)
+                if entry['executable']:
+                    os.chmod(outFile, st.st_mode | stat.S_IEXEC)
+                else:
+                    os.chmod(outFile, st.st_mode & ~stat.S_IEXEC)
+            files.append(outFile)
+        sys.stdout.write("done\n")
 
-        # copy target and make it executable
-        inFile = os.path.join(self.applicationDir, self.target)
-        targetFile = os.path.join(self.outBinDir, self.target)
-        shutil.copyfile(inFile, targetFile)
-        st = os.stat(targetFile)
-        os.chmod(targetFile, st.st_mode | stat.S_IEXEC)
+        sys.stdout.write("compressing files...")
+        sys.stdout.flush()
+        compressed = self.createArchive(files)
+        sys.stdout.write("done\n")
 
-        # copy QML plugins
+        if self.bundle:
+            sys.stdout.write("creating bundle...")
+            sys.stdout.flush()
+            self.createBundle(files)
+            sys.stdout.write("done\n")
+
+        self.sizeReport(sizes, compressed)
+
+    def runScript(self):
+        script = '#!/usr/bin/env bash\n'
+        script += 'if [ -z "$BASH_SOURCE" ]; then\n'
+        script += 'cd "$(dirname "$(readlink -f "$0")")"\n'
+        script += 'else\n'
+        script += 'cd "$(dirname "${BASH_SOURCE[0]}" )"\n'
+        script += 'fi\n'
+        script += 'CWD=`pwd`\n'
+        script += 'export LD_LIBRARY_PATH="$CWD"/lib\n'
+        script += 'export QML_IMPORT_PATH="$CWD"/qml\n'
+        script += 'export QML2_IMPORT_PATH="$CWD"/qml\n'
+        script += 'export QT_QPA_PLATFORM_PLUGIN_PATH="$CWD"/platforms\n'
+        script += 'export QT_PLUGIN_PATH="$CWD"/plugins\n'
+        if (self.platform == 'linux_x86'):
+            script += '/lib/ld-linux.so.2 '
+        else:
+            script += '/lib64/ld-linux-x86-64.so.2 '
+        script += '"$CWD"/bin/' + self.target + ' $@\n'
+        script += 'exit $?\n'
+        return script
+
+    def createArchive(self, files):
+        manifest = []
+        compressed = {}
+        if self.zipName.endswith('.zip'):
+            # zipfile seeks back to complete the member headers, so the archive
+            # is hashed after writing, all files are read in chunks
+            with zipfile.ZipFile(self.zipName, 'w', zipfile.ZIP_DEFLATED) as myzip:
+                for f in files:
+                    position = myzip.fp.tell()
+                    myzip.write(f)
+                    compressed[f] = myzip.fp.tell() - position
+                    manifest.append((fileChecksum(f), myzip.filelist[-1].filename))
+                myzip.close()
+            self.archiveHash = fileChecksum(self.zipName)
+        else:
+            # the checksums of the archive and its members are computed while writing
+            archiveFile = HashingWriter(open(self.zipName, 'wb'))
+            with tarfile.open(self.zipName, 'w:gz', archiveFile) as mytar:
+                for f in files:
+                    position = archiveFile.tell()
+                    tarinfo = mytar.gettarinfo(f)
+                    if tarinfo.isreg():
+                        with open(f, 'rb') as memberFile:
+                            member = HashingReader(memberFile)
+                            mytar.addfile(tarinfo, member)
+                        manifest.append((member.hash.hexdigest(), tarinfo.name))
+                    else:
+                        mytar.addfile(tarinfo)
+                    # flush the compressor to attribute the compressed bytes to the member
+                    mytar.fileobj.flush()
+                    compressed[f] = archiveFile.tell() - position
+                mytar.close()
+            archiveFile.close()
+            self.archiveHash = archiveFile.hash.hexdigest()
+
+        with open(self.manifestFile, 'w') as f:
+            for digest, name in manifest:
+                f.write('%s  %s\n' % (digest, name))
+        updateChecksums(self.checksumFile, os.path.basename(self.zipName), self.archiveHash)
+        return compressed
+
+    def isStartupFile(self, f):
+        if not self.bundleStartup:
+            return True
+        path = os.path.relpath(f, self.deploymentDir)
+        if path in (self.target, os.path.join('bin', self.target)):
+            return True
+        for startupPath in self.bundleStartup:
+            if (path == startupPath) or path.startswith(startupPath.rstrip('/') + '/'):
+                return True
+        return False
+
+    def createBundle(self, files):
+        startup = [f for f in files if self.isStartupFile(f)]
+        rest = [f for f in files if not self.isStartupFile(f)]
+
+        if rest:
+            # one archive for the startup members and one for the rest
+            payload = tempfile.TemporaryFile()
+            payloadFile = HashingWriter(payload)
+            sizes = []
+            for segment in [startup, rest]:
+                position = payloadFile.tell()
+                with tarfile.open(os.path.basename(self.zipName), 'w:gz', payloadFile) as mytar:
+                    for f in segment:
+                        mytar.add(f)
+                    mytar.close()
+                sizes.append(payloadFile.tell() - position)
+            payloadHash = payloadFile.hash.hexdigest()
+            payload.seek(0)
+        else:
+            # the package can be used as it is
+            payload = open(self.zipName, 'rb')
+            sizes = [os.path.getsize(self.zipName), 0]
+            payloadHash = self.archiveHash
+
+        values = {'name': self.name,
+                  'hash': payloadHash[:16],
+                  'target': self.target,
+                  'strip': len([p for p in self.deploymentDir.split('/') if p]),
+                  'offset': 0,
+                  'startupSize': sizes[0],
+                  'restSize': sizes[1]}
+        values['offset'] = len(BUNDLE_STUB % values)
+        bundleFile = HashingWriter(open(self.bundleFile, 'wb'))
+        bundleFile.write(BUNDLE_STUB % values)
+        shutil.copyfileobj(payload, bundleFile)
+        bundleFile.close()
+        payload.close()
+
+        st = os.stat(self.bundleFile)
+        os.chmod(self.bundleFile, st.st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+        updateChecksums(self.checksumFile, os.path.basename(self.bundleFile), bundleFile.hash.hexdigest())
+
+    def sizeReport(self, sizes, compressed):
+        # sizes maps every packaged file to its component, raw and stripped size
+        components = {}
+        for f in sizes.keys():
+            component, rawSize, strippedSize = sizes[f]
+            if component not in components:
+                components[component] = {'files': 0, 'raw': 0, 'stripped': 0, 'compressed': 0}
+            components[component]['files'] += 1
+            components[component]['raw'] += rawSize
+            components[component]['stripped'] += strippedSize
+            components[component]['compressed'] += compressed.get(f, 0)
+        report = {'package': os.path.basename(self.zipName),
+                  'size': os.path.getsize(self.zipName),
+                  'components': components}
+
+        baseline = None
+        if self.sizeBaseline:
+            with open(self.sizeBaseline, 'r') as f:
+                baseline = json.load(f)
+
+        with open(self.sizeReportFile, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+
+        if self.sizeTable or baseline:
+            self.printSizeReport(report, baseline)
+        if self.sizeBudget:
+            if baseline:
+                self.checkSizeBudget(report, baseline)
+            else:
+                sys.stderr.write('warning: no size baseline given, size budget %s not checked\n' % self.sizeBudget)
+
+    def printSizeReport(self, report, baseline):
+        components = report['components']
+        sys.stdout.write('%-32s %6s %12s %12s %12s %12s\n'
+                         % ('component', 'files', 'raw', 'stripped', 'compressed', 'change'))
+        totals = {'files': 0, 'raw': 0, 'stripped': 0, 'compressed': 0}
+        for name in sorted(components.keys(), key=lambda c: -components[c]['compressed']):
+            component = components[name]
+            change = ''
+            if baseline:
+                change = '%+i' % (component['compressed'] - baseline['components'].get(name, {}).get('compressed', 0))
+            sys.stdout.write('%-32s %6i %12i %12i %12i %12s\n'
+                             % (name, component['files'], component['raw'], component['stripped'],
+                                component['compressed'], change))
+            for key in totals.keys():
+                totals[key] += component[key]
+        if baseline:
+            # components that are no longer part of the package
+            for name in sorted(baseline['components'].keys()):
+                if name not in components:
+                    sys.stdout.write('%-32s %6i %12i %12i %12i %12s\n'
+                                     % (name, 0, 0, 0, 0, '%+i' % -baseline['components'][name]['compressed']))
+        change = ''
+        if baseline:
+            change = '%+i' % (report['size'] - baseline['size'])
+        sys.stdout.write('%-32s %6i %12i %12i %12i %12s\n'
+                         % ('total', totals['files'], totals['raw'], totals['stripped'], report['size'], change))
+
+    def checkSizeBudget(self, report, baseline):
+        if self.sizeBudget.endswith('%'):
+            budget = baseline['size'] * float(self.sizeBudget[:-1]) / 100.0
+        else:
+            budget = int(self.sizeBudget)
+        growth = report['size'] - baseline['size']
+        if growth > budget:
+            sys.stderr.write('package grew by %i bytes, the size budget is %i bytes\n' % (growth, budget))
+            exit(1)
+
+    def deployedFiles(self):
+        files = []
+        for root, dirs, filenames in os.walk(self.deploymentDir):
+            for f in filenames:
+                files.append(os.path.join(root, f))
+        return files
+
+    def deployPlatform(self):
+        if self.platform == 'mac':
+            self.deployMac()
+        elif 'android' in self.platform:
+            self.deployAndroid()
+        elif 'windows' in self.platform:
+            self.deployWindows()
+        elif 'linux' in self.platform:
+            self.deployLinux()
+        else:
+            sys.stderr.write('unsupported platform %s\n' % self.platform)
+            sys.exit(1)
+
+    def linuxTrees(self):
+        trees = []
         if self.qmlPlugins[0] != '':
             for qmlplugin in self.qmlPlugins:
-                targetPath = os.path.join(self.outQmlDir, qmlplugin)
-                if os.path.exists(targetPath):
-                    shutil.rmtree(targetPath)
-                shutil.copytree(os.path.join(self.qmlDir, qmlplugin), targetPath)
-
-        # copy Qt plugins
+                trees.append((os.path.join(self.qmlDir, qmlplugin), os.path.join(self.outQmlDir, qmlplugin)))
         if self.qtPlugins[0] != '':
             for qtplugin in self.qtPlugins:
-                targetPath = os.path.join(self.outPluginDir, qtplugin)
-                if os.path.exists(targetPath):
-                    shutil.rmtree(targetPath)
-                shutil.copytree(os.path.join(self.pluginDir, qtplugin), targetPath)
+                trees.append((os.path.join(self.pluginDir, qtplugin), os.path.join(self.outPluginDir, qtplugin)))
+        return trees
+
+    def updateLinux(self, entries, state):
+        # state maps deployed files to the (mtime, size) of their source at the last update
+        updated = 0
+        planned = set()
+        for entry in entries:
+            planned.add(entry['dst'])
+            if entry['action'] not in ('copy', 'strip'):
+                continue
+            inFile = entry['src']
+            outFile = entry['dst']
+            st = os.stat(inFile)
+            inState = (st.st_mtime, st.st_size)
+            if outFile in state:
+                if state[outFile] == inState:
+                    continue
+            elif os.path.exists(outFile) and (st.st_mtime < os.path.getmtime(outFile)):
+                # not seen before, deployed files carry the time of the copy so
+                # the source is unchanged if it is older, equal times are copied again
+                state[outFile] = inState
+                continue
 
-        # remove unnecessary files:
-        for root, dirs, files in os.walk(self.outQmlDir):
+            outDir = os.path.dirname(outFile)
+            if not os.path.exists(outDir):
+                os.makedirs(outDir)
+            # replace the file atomically, the application may be running
+            tmp = outFile + '.tmp'
+            shutil.copy(inFile, tmp)
+            if entry['action'] == 'strip':
+                check_call(['strip', tmp])
+            if entry['executable'] is not None:
+                st = os.stat(tmp)
+                if entry['executable']:
+                    os.chmod(tmp, st.st_mode | stat.S_IEXEC)
+                else:
+                    os.chmod(tmp, st.st_mode & ~stat.S_IEXEC)
+            os.rename(tmp, outFile)
+            state[outFile] = inState
+            updated += 1
+            if self.debug:
+                print('updated %s' % outFile)
+
+        # remove files deleted from the QML and plugin dirs
+        for srcDir, outDir in self.linuxTrees():
+            for root, dirs, files in os.walk(outDir):
                 for f in files:
-                    if (f == 'plugins.qmltypes'):
-                        os.remove(os.path.join(root, f))
-
-        sys.stdout.write("done\n")
+                    outFile = os.path.join(root, f)
+                    if outFile not in planned:
+                        os.remove(outFile)
+                        state.pop(outFile, None)
+                        updated += 1
+                        if self.debug:
+                            print('removed %s' % outFile)
+
+        return updated
+
+    def watchDirs(self):
+        dirs = [(self.applicationDir, False)]
+        if 'linux' in self.platform:
+            dirs.append((self.qtLibDir, False))
+            for libDir in self.libDirs:
+                dirs.append((libDir, False))
+            dirs.append((self.platformsDir, False))
+            for srcDir, outDir in self.linuxTrees():
+                dirs.append((srcDir, True))
+        else:
+            if 'windows' in self.platform:
+                dirs.append((self.libDir, False))
+            if hasattr(self, 'qmlSourceDir'):
+                dirs.append((self.qmlSourceDir, True))
+        return [(path, recursive) for (path, recursive) in dirs if os.path.isdir(path)]
+
+    def watchSnapshot(self, dirs):
+        snapshot = {}
+        for path, recursive in dirs:
+            for root, subdirs, files in os.walk(path):
+                for f in files:
+                    try:
+                        st = os.stat(os.path.join(root, f))
+                    except OSError:    # removed or dangling symlink
+                        continue
+                    snapshot[os.path.join(root, f)] = (st.st_mtime, st.st_size)
+                if not recursive:
+                    break
+        return snapshot
+
+    def waitForChanges(self, dirs, notifier):
+        # returns after a burst of changes has settled down
+        changed = False
+        snapshot = None
+        if notifier is None:
+            snapshot = self.watchSnapshot(dirs)
+        while True:
+            if notifier is not None:
+                if notifier.check_events(timeout=int(self.watchDelay * 1000)):
+                    notifier.read_events()
+                    notifier.process_events()
+                    changed = True
+                    continue
+            else:
+                time.sleep(self.watchDelay)
+                current = self.watchSnapshot(dirs)
+                if current != snapshot:
+                    snapshot = current
+                    changed = True
+                    continue
+            if changed:
+                return
 
-        sys.stdout.write("compressing files...")
+    def watch(self):
+        state = {}
+        if 'linux' in self.platform:
+            if not os.path.exists(self.deploymentDir):
+                self.deployLinux()
+            try:
+                self.updateLinux(self.planLinux(), state)    # catch up with changes since the last deployment
+            except (IOError, OSError, CalledProcessError) as e:
+                sys.stderr.write('update failed: %s\n' % e)
+
+        dirs = self.watchDirs()
+        notifier = None
+        if pyinotify:
+            wm = pyinotify.WatchManager()
+            mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_CREATE | pyinotify.IN_DELETE \
+                | pyinotify.IN_MOVED_TO | pyinotify.IN_MOVED_FROM
+            for path, recursive in dirs:
+                wm.add_watch(path, mask, rec=recursive, auto_add=recursive)
+            notifier = pyinotify.Notifier(wm, default_proc_fun=lambda event: None)
+        elif self.debug:
+            print('pyinotify not found, polling for changes')
+
+        sys.stdout.write("watching for changes...\n")
         sys.stdout.flush()
-        # strip debug information
-        for root, dirs, files in os.walk(self.outLibDir):
-            for f in files:
-                if self.libraryExtension in f:
-                    check_call(['strip', os.path.join(root, f)])
-        check_call(['strip', os.path.join(self.outBinDir, self.target)])
-
-        # create run.sh
-        runFilePath = os.path.join(self.deploymentDir, self.target)
-        runFile = open(runFilePath, 'w')
-        if runFile:
-            runFile.write('#!/usr/bin/env bash\n')
-            runFile.write('if [ -z "$BASH_SOURCE" ]; then\n')
-            runFile.write('cd "$(dirname "$(readlink -f "$0")")"\n')
-            runFile.write('else\n')
-            runFile.write('cd "$(dirname "${BASH_SOURCE[0]}" )"\n')
-            runFile.write('fi\n')
-            runFile.write('CWD=`pwd`\n')
-            runFile.write('export LD_LIBRARY_PATH="$CWD"/lib\n')
-            runFile.write('export QML_IMPORT_PATH="$CWD"/qml\n')
-            runFile.write('export QML2_IMPORT_PATH="$CWD"/qml\n')
-            runFile.write('export QT_QPA_PLATFORM_PLUGIN_PATH="$CWD"/platforms\n')
-            runFile.write('export QT_PLUGIN_PATH="$CWD"/plugins\n')
-            if (self.platform == 'linux_x86'):
-                runFile.write('/lib/ld-linux.so.2 ')
-            else:
-                runFile.write('/lib64/ld-linux-x86-64.so.2 ')
-            runFile.write('"$CWD"/bin/' + self.target + ' $@\n')
-            runFile.write('exit $?\n')
-            runFile.close()
-            st = os.stat(runFilePath)
-            os.chmod(runFilePath, st.st_mode | stat.S_IEXEC)
+        try:
+            while True:
+                self.waitForChanges(dirs, notifier)
+                start = time.time()
+                try:
+                    if 'linux' in self.platform:
+                        entries = self.planLinux()
+                        updated = self.updateLinux(entries, state)
+                        if updated and self.watchArchive:
+                            self.createArchive([e['dst'] for e in entries if e['action'] not in ('delete', 'skip')])
+                        sys.stdout.write("updated %i files in %.2f seconds\n" % (updated, time.time() - start))
+                    else:
+                        self.deployPlatform()
+                except (IOError, OSError, CalledProcessError) as e:
+                    # the build may still be in progress, try again on the next change
+                    sys.stderr.write('update failed: %s\n' % e)
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            sys.stdout.write("stopped watching\n")
+        finally:
+            if notifier is not None:
+                notifier.stop()
+
+    def extractPackage(self, outDir):
+        if tarfile.is_tarfile(self.zipName):
+            with tarfile.open(self.zipName, 'r:*') as mytar:
+                mytar.extractall(outDir)
         else:
-            sys.stderr.write('error creating %s\n' % runFilePath)
-            exit(1)
-        # create tar file
-        with tarfile.open(self.zipName, 'w:gz') as mytar:
-            for root, dirs, files in os.walk(self.deploymentDir):
+            with zipfile.ZipFile(self.zipName, 'r') as myzip:
+                myzip.extractall(outDir)
+
+    def findLauncher(self, rootDir):
+        # prefer the generated run.sh, it sits next to the bin dir
+        binary = None
+        for root, dirs, files in os.walk(rootDir):
+            if self.target not in files:
+                continue
+            if os.path.isfile(os.path.join(root, 'bin', self.target)):
+                return os.path.join(root, self.target)
+            if binary is None:
+                binary = os.path.join(root, self.target)
+        return binary
+
+    def dropPageCache(self, rootDir):
+        # dirty pages cannot be dropped, write them back first
+        check_call(['sync'])
+        with open(os.devnull, 'w') as devnull:
+            for root, dirs, files in os.walk(rootDir):
                 for f in files:
-                    mytar.add(os.path.join(root, f))
-            mytar.close()
-        sys.stdout.write("done\n")
+                    check_call(['dd', 'if=' + os.path.join(root, f), 'iflag=nocache',
+                                'count=0'], stderr=devnull)
+
+    def benchmarkRun(self, launcher, rootDir, cold, traced=False):
+        # traced runs collect the linker statistics, the logging slows down
+        # the start so only untraced runs are timed
+        if cold:
+            self.dropPageCache(rootDir)
+
+        debugDir = tempfile.mkdtemp()
+        try:
+            debugPrefix = os.path.join(debugDir, 'ld-debug')
+            env = os.environ.copy()
+            if traced:
+                env['LD_DEBUG'] = 'statistics,files'
+                env['LD_DEBUG_OUTPUT'] = debugPrefix
+
+            start = time.time()
+            # run.sh starts the application as a child, use a process group to reach both
+            proc = subprocess.Popen([launcher], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    cwd=os.path.dirname(launcher), env=env, preexec_fn=os.setsid)
+            timedOut = []
+            timer = threading.Timer(self.benchmarkTimeout,
+                                    lambda: timedOut.append(killProcessGroup(proc, signal.SIGKILL)))
+            timer.start()
+            markerFound = False
+            try:
+                for line in iter(proc.stdout.readline, ''):
+                    if self.benchmarkMarker and self.benchmarkMarker in line:
+                        markerFound = True
+                        break
+                wallTime = time.time() - start
+            finally:
+                timer.cancel()
+                # never leave any part of the application running
+                killProcessGroup(proc, signal.SIGTERM)
+                proc.stdout.close()
+                proc.wait()
+
+            if timedOut:
+                sys.stderr.write('application did not finish within %i seconds\n' % self.benchmarkTimeout)
+                exit(1)
+            if self.benchmarkMarker and not markerFound:
+                sys.stderr.write('marker %s not found in application output\n' % self.benchmarkMarker)
+                exit(1)
+
+            if traced:
+                return parseLinkerDebug(debugPrefix, rootDir)
+            return {'wallTime': wallTime}
+        finally:
+            shutil.rmtree(debugDir)
+
+    def compareBenchmark(self, results):
+        with open(self.benchmarkBaseline, 'r') as f:
+            baseline = json.load(f)
+
+        sys.stdout.write('%-6s %-14s %14s %14s %9s\n' % ('cache', 'metric', 'baseline', 'current', 'change'))
+        for variant in sorted(results.keys()):
+            if variant not in baseline:
+                continue
+            for key in sorted(results[variant].keys()):
+                old = baseline[variant].get(key, 0)
+                new = results[variant][key]
+                if old:
+                    change = '%+.1f%%' % ((new - old) * 100.0 / old)
+                else:
+                    change = '-'
+                sys.stdout.write('%-6s %-14s %14.4g %14.4g %9s\n' % (variant, key, old, new, change))
+
+    def benchmark(self):
+        if 'linux' not in self.platform:
+            sys.stderr.write('benchmark is not supported on platform %s\n' % self.platform)
+            sys.exit(1)
+
+        sys.stdout.write("unpacking package...")
+        sys.stdout.flush()
+        rootDir = tempfile.mkdtemp()
+        try:
+            self.extractPackage(rootDir)
+            launcher = self.findLauncher(rootDir)
+            if not launcher:
+                sys.stderr.write('could not find %s in %s\n' % (self.target, self.zipName))
+                exit(1)
+            sys.stdout.write("done\n")
+
+            results = {}
+            for variant in ['warm', 'cold']:
+                sys.stdout.write("running %s start benchmark..." % variant)
+                sys.stdout.flush()
+                # the traced run also fills the page cache for the warm runs
+                results[variant] = self.benchmarkRun(launcher, rootDir, variant == 'cold', True)
+                runs = []
+                for i in range(self.benchmarkRuns):
+                    runs.append(self.benchmarkRun(launcher, rootDir, variant == 'cold'))
+                results[variant]['wallTime'] = median([run['wallTime'] for run in runs])
+                sys.stdout.write("done\n")
+
+                if self.debug:
+                    print(results[variant])
+        finally:
+            shutil.rmtree(rootDir)
+
+        if not self.benchmarkBaseline:
+            print(json.dumps(results, indent=4, sort_keys=True))
+        elif os.path.isfile(self.benchmarkBaseline):
+            self.compareBenchmark(results)
+        else:
+            sys.stdout.write("writing baseline %s..." % self.benchmarkBaseline)
+            sys.stdout.flush()
+            with open(self.benchmarkBaseline, 'w') as f:
+                json.dump(results, f, indent=4, sort_keys=True)
+            sys.stdout.write("done\n")
 
     def preparePath(self, path):
         path = os.path.expanduser(path)
@@ -417,6 +1169,19 @@ class QtDeployment:
         self.qtDir = self.preparePath(config.get('Deployment', 'qtDir').strip('"'))
         self.applicationDir = self.preparePath(config.get('Deployment', 'applicationDir').strip('"'))
         self.pkgName = self.preparePath(config.get('Deployment', 'pkgName').strip('"'))
+        if not self.sizeBudget and config.has_option('Deployment', 'sizeBudget'):
+            self.sizeBudget = config.get('Deployment', 'sizeBudget', raw=True).strip('"')
+        if self.sizeBudget:
+            # fail before deploying instead of after the package is written
+            self.sizeBudget = self.sizeBudget.replace(' ', '')
+            try:
+                if self.sizeBudget.endswith('%'):
+                    float(self.sizeBudget[:-1])
+                else:
+                    int(self.sizeBudget)
+            except ValueError:
+                sys.stderr.write('invalid size budget %s, expected bytes or percent, e.g. 500000 or 5%%\n' % self.sizeBudget)
+                sys.exit(1)
         if self.platform == "mac":
             self.qmlSourceDir = self.preparePath(config.get('Deployment', 'qmlSourceDir').strip('"'))
         elif "windows" in self.platform:
@@ -442,12 +1207,31 @@ class QtDeployment:
             self.platformPlugins = config.get('Deployment', 'platformPlugins').strip('"').split(',')
             self.qtLibs = config.get('Deployment', 'qtLibs').strip('"').split(',')
             self.libs = config.get('Deployment', 'libs').strip('"').split(',')
+            self.bundleStartup = []
+            if config.has_option('Deployment', 'bundleStartup'):
+                for path in config.get('Deployment', 'bundleStartup').strip('"').split(','):
+                    if path.strip() != '':
+                        self.bundleStartup.append(path.strip())
 
     def parseArguments(self):
         parser = argparse.ArgumentParser(description='Component for easy deployment of Qt applications')
         parser.add_argument('-v', '--version', help='Version of the application', required=None)
         parser.add_argument('--deploy', help='Deploy the application to the output directory', action='store_true')
+        parser.add_argument('--plan', help='Create the deployment plan without deploying', action='store_true')
+        parser.add_argument('--apply', help='Deploy the application using the cached deployment plan', action='store_true')
+        parser.add_argument('--dry-run', help='Print the size of the planned deployment without touching any files', action='store_true')
+        parser.add_argument('--bundle', help='Also create a self-extracting executable of the application', action='store_true')
+        parser.add_argument('--size-report', help='Print the size of each component of the package', action='store_true')
+        parser.add_argument('--size-baseline', help='Compare the package size against this size report', default=None)
+        parser.add_argument('--size-budget', help='Allowed growth of the package in bytes or percent, e.g. 5%%', default=None)
         parser.add_argument('--clean', help='Cleanup the created files afterwards', action='store_true')
+        parser.add_argument('--watch', help='Redeploy the changed files whenever the build output changes', action='store_true')
+        parser.add_argument('--watch-archive', help='Recreate the package in watch mode', action='store_true')
+        parser.add_argument('--watch-delay', help='Time in seconds a burst of changes must settle down', type=float, default=0.3)
+        parser.add_argument('--benchmark', help='Unpack the package and measure the startup N times', type=int, default=0, metavar='N')
+        parser.add_argument('--benchmark-marker', help='Stop timing when the application prints this marker', default=None)
+        parser.add_argument('--benchmark-baseline', help='Compare against this baseline, created if it does not exist', default=None)
+        parser.add_argument('--benchmark-timeout', help='Maximum time in seconds for a single run', type=int, default=60)
         parser.add_argument('-d', '--debug', help='Whether debug output should be enabled or not', action='store_true')
         parser.add_argument('config', help='Config file', nargs='?', default=None)
         args = parser.parse_args()
@@ -455,7 +1239,21 @@ class QtDeployment:
         self.version = args.version
         self.debug = args.debug
         self.deploy = args.deploy
+        self.plan = args.plan
+        self.apply = args.apply
+        self.dryRun = args.dry_run
+        self.bundle = args.bundle
+        self.sizeTable = args.size_report
+        self.sizeBaseline = args.size_baseline
+        self.sizeBudget = args.size_budget
         self.clean = args.clean
+        self.watchMode = args.watch
+        self.watchArchive = args.watch_archive
+        self.watchDelay = args.watch_delay
+        self.benchmarkRuns = args.benchmark
+        self.benchmarkMarker = args.benchmark_marker
+        self.benchmarkBaseline = args.benchmark_baseline
+        self.benchmarkTimeout = args.benchmark_timeout
         self.configFile = args.config
 
         if self.debug:
@@ -485,6 +1283,7 @@ class QtDeployment:
             self.qtLibDir = os.path.join(self.qtDir, 'lib')
             self.outLibDir = os.path.join(self.deploymentDir, 'lib')
             self.outBinDir = os.path.join(self.deploymentDir, 'bin')
+            self.planFile = self.pkgName + '.plan.json'
         elif (self.platform == 'mac'):
             self.targetExtension = '.app'
             self.qtBinDir = os.path.join(self.qtDir, 'bin')
@@ -505,6 +1304,10 @@ class QtDeployment:
 
         self.target = self.name.lower() + self.targetExtension
         self.targetOriginal = self.pkgName + self.targetExtension
+        self.manifestFile = self.pkgName + '.manifest'
+        self.sizeReportFile = self.pkgName + '.size.json'
+        self.bundleFile = self.pkgName + '.run'
+        self.checksumFile = os.path.join(os.path.dirname(self.pkgName), 'SHA256SUMS')
         self.qmlDir = os.path.join(self.qtDir, 'qml')
         self.pluginDir = os.path.join(self.qtDir, 'plugins')
         self.platformsDir = os.path.join(self.qtDir, 'plugins/platforms')
@@ -516,18 +1319,28 @@ class QtDeployment:
         self.parseArguments()
         self.parseConfig()
         self.createVars()
-        if self.deploy:
-            if self.platform == 'mac':
-                self.deployMac()
-            elif 'android' in self.platform:
-                self.deployAndroid()
-            elif 'windows' in self.platform:
-                self.deployWindows()
-            elif 'linux' in self.platform:
-                self.deployLinux()
-            else:
-                sys.stderr.write('unsupported platform %s\n' % self.platform)
+        if self.bundle and ('linux' not in self.platform):
+            sys.stderr.write('bundles are not supported on platform %s\n' % self.platform)
+            sys.exit(1)
+        if self.plan or self.apply or self.dryRun:
+            if 'linux' not in self.platform:
+                sys.stderr.write('deployment plans are not supported on platform %s\n' % self.platform)
+                sys.exit(1)
+            try:
+                entries = self.createPlan()
+                if self.dryRun or not self.apply:
+                    self.printPlan(entries)
+                else:
+                    self.applyPlan(entries)
+            except IOError as e:
+                sys.stderr.write('%s\n' % e)
                 sys.exit(1)
+        elif self.deploy:
+            self.deployPlatform()
+        if self.watchMode:
+            self.watch()
+        if self.benchmarkRuns > 0:
+            self.benchmark()
         if self.clean:
             self.cleanup()
 
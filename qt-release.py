@@ -12,6 +12,7 @@ import mimetypes
 import re
 import argparse
 import ConfigParser
+from StringIO import StringIO
 
 
 def printInfo(text):
@@ -38,6 +39,7 @@ class QtRelease:
         self.zipName = ''
         self.pkgName = ''
         self.pkgPattern = ''
+        self.checksumFile = ''
         self.authorize = False
         self.debug = False
         self.configFile = ''
@@ -113,6 +115,7 @@ class QtRelease:
         else:
             printInfo('unknown platform\n')
             exit(1)
+        self.checksumFile = os.path.join(os.path.dirname(self.pkgName), 'SHA256SUMS')
 
         self.releaseDescription = ''
         if os.path.exists(self.descriptionFile):
@@ -213,6 +216,64 @@ class QtRelease:
 
         printInfo('done\n')
 
+    def uploadChecksums(self):
+        if not os.path.isfile(self.checksumFile):
+            return
+
+        printInfo('uploading checksums to GitHub...')
+
+        checksumName = os.path.basename(self.checksumFile)
+        tmpName = checksumName + '.tmp'
+        oldAssets = []
+        assetNames = []
+        lines = []
+        # keep the checksums of the packages uploaded for other platforms
+        for asset in self.release.assets():
+            assetNames.append(asset.name)
+            if asset.name == checksumName:
+                remoteFile = StringIO()
+                asset.download(remoteFile)
+                lines += remoteFile.getvalue().splitlines()
+                oldAssets.append(asset)
+            elif asset.name == tmpName:    # left over from a failed upload
+                asset.delete()
+        with open(self.checksumFile, 'r') as f:
+            lines += f.read().splitlines()
+
+        # only published files are listed, e.g. the self-extracting bundle is not uploaded
+        checksums = {}
+        for line in lines:
+            if '  ' not in line:
+                continue
+            [digest, name] = line.split('  ', 1)
+            if name in assetNames:
+                checksums[name] = digest
+
+        content = ''
+        for name in sorted(checksums.keys()):
+            content += '%s  %s\n' % (checksums[name], name)
+
+        # the old checksums are replaced only after the new ones are uploaded
+        asset = None
+        try:
+            asset = self.release.upload_asset(content_type='text/plain',
+                                              name=tmpName,
+                                              asset=content)
+        except:
+            pass
+
+        if not asset:
+            printInfo('uploading checksums failed\n')
+            exit(1)
+
+        for oldAsset in oldAssets:
+            oldAsset.delete()
+        if not asset.edit(checksumName):
+            printInfo('renaming %s to %s failed\n' % (tmpName, checksumName))
+            exit(1)
+
+        printInfo('done\n')
+
     def run(self):
         self.parseArguments()
         if self.authorize:
@@ -224,6 +285,7 @@ class QtRelease:
             self.getRelease()
             self.deleteAssets()
             self.uploadAsset()
+            self.uploadChecksums()
 
 
 release = QtRelease()